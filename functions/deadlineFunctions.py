@@ -0,0 +1,35 @@
+import time
+import logging
+from typing import Dict, Optional
+
+# ------------------------------------------------------------
+# Run Deadline — run-level budget split into stage budgets
+# ------------------------------------------------------------
+
+def start_deadline(total_seconds: float) -> Dict[str, float]:
+    """
+    Start the run-level deadline `total_seconds` from now (monotonic clock).
+    """
+    logging.info(f' - Run deadline set: {total_seconds:.0f}s')
+    return {'end': time.monotonic() + total_seconds}
+
+def stage_deadline(run_deadline: Dict[str, float], budget_seconds: float, stage: str = '') -> Dict[str, float]:
+    """
+    Start a stage deadline: `budget_seconds` from now, never past the run deadline.
+    """
+    end = min(run_deadline['end'], time.monotonic() + budget_seconds)
+    logging.info(f' - Stage budget{" for " + stage if stage else ""}: {max(0.0, end - time.monotonic()):.0f}s')
+    return {'end': end}
+
+def remaining(deadline: Dict[str, float], cap: Optional[float] = None) -> float:
+    """
+    Seconds left before `deadline` (>= 0), optionally capped at `cap`.
+    """
+    left = max(0.0, deadline['end'] - time.monotonic())
+    return min(left, cap) if cap is not None else left
+
+def expired(deadline: Dict[str, float]) -> bool:
+    """
+    True once the deadline has passed.
+    """
+    return time.monotonic() >= deadline['end']
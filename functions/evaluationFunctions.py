@@ -3,27 +3,30 @@ import pandas as pd
 # ------------------------------------------------------------
 # Helper functions — Build user list
 # ------------------------------------------------------------
-def build_dfUsers_from_df(df: pd.DataFrame) -> pd.DataFrame:
+def _clean_email(x) -> str:
+    # Drop NA/None/NaN; normalize whitespace & case
+    if pd.isna(x):
+        return ''
+    s = str(x).strip()
+    return s.lower() if '@' in s else ''
+
+def _clean_name(x) -> str:
+    if pd.isna(x):
+        return ''
+    return str(x).strip()
+
+def _email_name_map(df: pd.DataFrame) -> dict[str, str]:
     """
-    Builds and email df from df
+    Map normalized email -> display name from the EMAIL/NAME columns.
+
+    Rows without a valid email are skipped; the name falls back to the email,
+    and the longer non-empty name wins when one email carries several names.
     """
     email_col = _find_col(df, 'EMAIL')
     name_col  = _find_col(df, 'NAME')
 
     mapping: dict[str, str] = {}
 
-    def _clean_email(x) -> str:
-        # Drop NA/None/NaN; normalize whitespace & case
-        if pd.isna(x):
-            return ''
-        s = str(x).strip()
-        return s.lower() if '@' in s else ''
-
-    def _clean_name(x) -> str:
-        if pd.isna(x):
-            return ''
-        return str(x).strip()
-
     def add(email, name):
         e = _clean_email(email)
         if not e:
@@ -40,6 +43,14 @@ def build_dfUsers_from_df(df: pd.DataFrame) -> pd.DataFrame:
         for em, nm in zip(df[email_col], (names if names is not None else [None] * len(df))):
             add(em, nm)
 
+    return mapping
+
+def build_dfUsers_from_df(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Builds and email df from df
+    """
+    mapping = _email_name_map(df)
+
     # Return a stable, printable DataFrame
     rows = [{'Email': e, 'Name': mapping[e]} for e in sorted(mapping)]
     dfEmails = pd.DataFrame(rows, columns=['Email', 'Name'])
@@ -79,3 +90,65 @@ def compile_error_list(WANTED_COLUMNS, df_log: pd.DataFrame, person_email: str)
     # Keep only the requested columns that exist
     cols = [c for c in WANTED_COLUMNS if c in filtered.columns]
     return filtered.loc[:, cols].copy()
+
+def count_by_rule(df: pd.DataFrame, rule_order: list[str] | None = None) -> dict[str, int]:
+    """
+    Return {rule_id: row count} for RULE_ID (case-insensitive column lookup).
+
+    Rules listed in `rule_order` come first (zero-count rules are omitted),
+    then any others alphabetically. Returns {} if RULE_ID is missing.
+    """
+    rule_col = _find_col(df, 'RULE_ID')
+    if rule_col is None or df.empty:
+        return {}
+
+    counts = df[rule_col].fillna('').astype(str).str.strip().value_counts().to_dict()
+    ordered = [r for r in (rule_order or []) if r in counts] + sorted(r for r in counts if r not in (rule_order or []))
+    return {r: int(counts[r]) for r in ordered}
+
+# ------------------------------------------------------------
+# Helper functions — Consolidated digest
+# ------------------------------------------------------------
+def compile_digest(WANTED_COLUMNS, df_log: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return every row of df_log (WANTED_COLUMNS only) with a leading USER column
+    ('Name <email>', or 'Unassigned' when no settlement email is mapped), for
+    the single digest sent to CC and reviewer recipients.
+
+    Rows are keyed by normalized email with the name from the same mapping as
+    `build_dfUsers_from_df`, so each recipient gets exactly one USER value.
+    """
+    email_col = _find_col(df_log, 'EMAIL')
+
+    cols = [c for c in WANTED_COLUMNS if c in df_log.columns]
+    digest = df_log.loc[:, cols].copy()
+
+    names = _email_name_map(df_log)
+    em = df_log[email_col].map(_clean_email) if email_col else pd.Series('', index=df_log.index)
+    user = em.map(lambda e: f"{names[e]} <{e}>" if e else 'Unassigned')
+    digest.insert(0, 'USER', user)
+    return digest
+
+def digest_user_labels(df_digest: pd.DataFrame, status_order: list[str]) -> dict[str, str]:
+    """
+    Map USER -> heading with per-status counts (e.g. 'Mel <...> — Invoiced: 2 • Pending: 1').
+
+    Users are ordered alphabetically with 'Unassigned' last; statuses follow
+    `status_order` (normalized lowercase, as returned by load_htmlTable_settings).
+    """
+    if df_digest.empty or 'USER' not in df_digest.columns:
+        return {}
+
+    users = sorted(u for u in df_digest['USER'].unique() if u != 'Unassigned')
+    if (df_digest['USER'] == 'Unassigned').any():
+        users.append('Unassigned')
+
+    status = df_digest['STATUS'].fillna('').astype(str) if 'STATUS' in df_digest.columns else pd.Series('', index=df_digest.index)
+    rank = {s: i for i, s in enumerate(status_order)}
+
+    labels: dict[str, str] = {}
+    for u in users:
+        counts = status.loc[df_digest['USER'] == u].value_counts()
+        ordered = sorted(counts.index, key=lambda s: (rank.get(s.strip().lower(), len(rank)), s))
+        labels[u] = f"{u} — " + ' • '.join(f"{s or 'Unknown'}: {int(counts[s])}" for s in ordered)
+    return labels
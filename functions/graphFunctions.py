@@ -1,4 +1,5 @@
 import os
+import time
 import logging
 from typing import Dict, List, Optional
 import json
@@ -30,7 +31,7 @@ def read_graph_config() -> Dict[str, str]:
     logging.info("Microsoft Graph connection settings retrieved")
     return conf
 
-def _graph_token(tenant_id: str, client_id: str, client_secret: str) -> str:
+def _graph_token(tenant_id: str, client_id: str, client_secret: str, timeout: float = 30) -> str:
     """
     Fetch a Microsoft Graph access token using the client-credentials flow.
     """
@@ -46,17 +47,26 @@ def _graph_token(tenant_id: str, client_id: str, client_secret: str) -> str:
     encoded = urllib.parse.urlencode(data).encode('utf-8')
     req = urllib.request.Request(token_url, data=encoded, method='POST')
     req.add_header('Content-Type', 'application/x-www-form-urlencoded')
-    with urllib.request.urlopen(req, timeout=30) as resp:
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
         payload = json.loads(resp.read().decode('utf-8'))
     token = payload.get('access_token')
     if not token:
         raise RuntimeError('Failed to obtain Graph access token.')
     return token
 
-def send_email_graph(to_addr: str, subject: str, html_body: str, graph_conf: Dict[str, str], cc: Optional[List[str]] = None) -> None:
+def get_graph_token(graph_conf: Dict[str, str], timeout: float = 30) -> str:
+    """
+    Fetch an access token for `graph_conf`, to reuse across several sends.
+    """
+    return _graph_token(graph_conf.get('tenant_id'), graph_conf.get('client_id'), graph_conf.get('client_secret'), timeout)
+
+def send_email_graph(to_addr: str, subject: str, html_body: str, graph_conf: Dict[str, str], cc: Optional[List[str]] = None, timeout: float = 30, token: Optional[str] = None) -> None:
     """
     Send an HTML email via Microsoft Graph using app credentials.
     Optionally CC additional recipients via `cc`.
+    `token` reuses an access token from `get_graph_token`; otherwise one is fetched.
+    `timeout` (seconds) bounds the whole send: a token request and sendMail
+    share it (sendMail gets what the token request left, at least 1s).
     """
 
     sender = graph_conf.get('sender_upn')
@@ -68,7 +78,10 @@ def send_email_graph(to_addr: str, subject: str, html_body: str, graph_conf: Dic
         logging.warning('No recipient provided; skipping send.')
         return
 
-    token = _graph_token(tenant, client_id, client_secret)
+    t0 = time.monotonic()
+    if not token:
+        token = _graph_token(tenant, client_id, client_secret, timeout)
+    send_timeout = max(1.0, timeout - (time.monotonic() - t0))
 
     url = f'https://graph.microsoft.com/v1.0/users/{urllib.parse.quote(sender)}/sendMail'
     message = {
@@ -90,7 +103,7 @@ def send_email_graph(to_addr: str, subject: str, html_body: str, graph_conf: Dic
     req.add_header('Content-Type', 'application/json')
 
     try:
-        with urllib.request.urlopen(req, timeout=30) as resp:
+        with urllib.request.urlopen(req, timeout=send_timeout) as resp:
             if resp.status not in (200, 202):
                 raise RuntimeError(f'Unexpected Graph status code: {resp.status}')
         logging.info(f'Graph email sent to {to_addr} (subject: {subject}).')
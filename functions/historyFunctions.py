@@ -0,0 +1,243 @@
+import os
+import time
+import sqlite3
+import logging
+import datetime
+import statistics
+from typing import Dict, List, Optional
+import pandas as pd
+
+# ------------------------------------------------------------
+# Run History — compact per-run records in a local SQLite DB
+# ------------------------------------------------------------
+HISTORY_DB = 'history/runHistory.db'
+
+_SCHEMA = """
+create table if not exists runs (
+    run_id       integer primary key autoincrement,
+    job          text not null,
+    started_at   text not null,
+    finished_at  text,
+    duration_s   real,
+    status       text,
+    rows_fixed   integer
+);
+create table if not exists stages (
+    run_id   integer not null references runs(run_id),
+    stage    text not null,
+    seconds  real not null
+);
+create table if not exists counts (
+    run_id     integer not null references runs(run_id),
+    dimension  text not null,
+    key        text not null,
+    rows       integer not null
+);
+create table if not exists sends (
+    run_id     integer not null references runs(run_id),
+    kind       text not null,
+    recipient  text not null,
+    seconds    real not null,
+    ok         integer not null
+);
+create index if not exists ix_stages_stage on stages(stage, run_id);
+create index if not exists ix_counts_key on counts(dimension, key, run_id);
+"""
+
+def start_run_record(jobName: str) -> Dict:
+    """
+    Create an in-memory run record; the first stage starts on the first `mark_stage`.
+    """
+    return {
+        'job': jobName,
+        'started_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        '_t0': time.perf_counter(),
+        '_stage': None,
+        '_stage_t0': None,
+        'status': 'ok',
+        'rows_fixed': None,
+        'stages': [],
+        'counts': [],
+        'sends': [],
+    }
+
+def mark_stage(record: Dict, stage: Optional[str]) -> None:
+    """
+    Close the running stage (if any) and start timing `stage` (None just closes).
+    """
+    now = time.perf_counter()
+    if record['_stage'] is not None:
+        record['stages'].append((record['_stage'], now - record['_stage_t0']))
+    record['_stage'] = stage
+    record['_stage_t0'] = now
+
+def record_send(record: Dict, kind: str, recipient: str, seconds: float, ok: bool) -> None:
+    """
+    Append one Graph send (kind: 'user', 'digest' or 'reviewer') with its latency.
+    """
+    record['sends'].append((kind, recipient, float(seconds), 1 if ok else 0))
+
+def record_counts(record: Dict, df: pd.DataFrame, dimensions: List[str], prefix: str = '') -> None:
+    """
+    Append row counts of `df` per value of each column in `dimensions`
+    (e.g. STATUS, RULE_ID, BRANCH, SALESPERSON); missing columns are skipped.
+    `prefix` is prepended to the stored dimension (e.g. 'FIXED_' -> FIXED_STATUS).
+    """
+    for dim in dimensions:
+        if dim not in df.columns:
+            continue
+        vc = df[dim].fillna('').astype(str).str.strip().value_counts()
+        record['counts'].extend((prefix + dim, k or '(blank)', int(n)) for k, n in vc.items())
+
+def record_statement_counts(record: Dict, results, verb: str = 'UPDATE') -> Optional[int]:
+    """
+    Append rows affected per `verb` statement from `id_sqlScript` results
+    (dimension '<verb>_STATEMENT', keyed by statement title) and return their
+    total (None if there are no results).
+    """
+    if results is None:
+        return None
+    total = 0
+    for title, stmt_verb, rows in results:
+        if stmt_verb != verb:
+            continue
+        rows = max(int(rows or 0), 0)
+        record['counts'].append((f'{verb}_STATEMENT', title, rows))
+        total += rows
+    return total
+
+def save_run_record(record: Dict, db_path: str = HISTORY_DB) -> None:
+    """
+    Close the running stage and append the record to the history DB.
+
+    History must never fail the job: errors are logged, not raised.
+    """
+    mark_stage(record, None)
+    finished = datetime.datetime.now().isoformat(timespec='seconds')
+    duration = time.perf_counter() - record['_t0']
+
+    connection = None
+    try:
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        connection = sqlite3.connect(db_path)
+        connection.executescript(_SCHEMA)
+        with connection:
+            cur = connection.execute(
+                'insert into runs (job, started_at, finished_at, duration_s, status, rows_fixed) values (?, ?, ?, ?, ?, ?)',
+                (record['job'], record['started_at'], finished, duration, record['status'], record['rows_fixed']))
+            run_id = cur.lastrowid
+            connection.executemany('insert into stages values (?, ?, ?)', [(run_id, s, sec) for s, sec in record['stages']])
+            connection.executemany('insert into counts values (?, ?, ?, ?)', [(run_id, *c) for c in record['counts']])
+            connection.executemany('insert into sends values (?, ?, ?, ?, ?)', [(run_id, *s) for s in record['sends']])
+        logging.info(f' - Run history saved (run_id {run_id}, {duration:.1f}s, status {record["status"]})')
+    except Exception as e:
+        logging.error(f' - Failed to save run history: {e}')
+    finally:
+        if connection:
+            connection.close()
+
+
+# ------------------------------------------------------------
+# History Report — rolling medians, p95 and drift flags
+# ------------------------------------------------------------
+def _p95(values: List[float]) -> float:
+    """
+    Nearest-rank 95th percentile.
+    """
+    ordered = sorted(values)
+    return ordered[max(0, -(-95 * len(ordered) // 100) - 1)]
+
+def _series_rows(series: Dict[str, List[float]], recent: int, tolerance: float) -> List[List[str]]:
+    """
+    Summarize oldest-first series: runs, last, median, p95, recent median, drift flag.
+
+    Drift is flagged when the median of the last `recent` values exceeds the
+    median of the earlier values by more than `tolerance` (needs 3+ earlier values).
+    """
+    rows = []
+    for name, values in series.items():
+        baseline, latest = values[:-recent], values[-recent:]
+        drift = ''
+        if len(baseline) >= 3:
+            base_med = statistics.median(baseline)
+            recent_med = statistics.median(latest)
+            if recent_med > base_med * (1 + tolerance) and recent_med > 0:
+                drift = f'DRIFT +{(recent_med / base_med - 1) * 100:.0f}%' if base_med else 'DRIFT (new)'
+        rows.append([name, str(len(values)), f'{values[-1]:.2f}', f'{statistics.median(values):.2f}',
+                     f'{_p95(values):.2f}', f'{statistics.median(latest):.2f}', drift])
+    return rows
+
+def _format_table(headers: List[str], rows: List[List[str]]) -> str:
+    """
+    Plain fixed-width text table.
+    """
+    widths = [max(len(str(x)) for x in col) for col in zip(headers, *rows)] if rows else [len(h) for h in headers]
+    line = lambda r: '  '.join(str(v).ljust(w) for v, w in zip(r, widths))
+    return '\n'.join([line(headers), line(['-' * w for w in widths])] + [line(r) for r in rows])
+
+def history_report(db_path: str = HISTORY_DB, window: int = 30, recent: int = 5, tolerance: float = 0.25, jobName: Optional[str] = None) -> str:
+    """
+    Build a text report over the last `window` runs: stage timings, issue volume
+    per status/rule/branch/salesperson and Graph send latency, each with rolling
+    median, p95 and a drift flag.
+
+    Stage series cover only the runs that recorded the stage (e.g. digest vs.
+    reviewer sends); volume series count a missing key as 0 rows.
+    """
+    if not os.path.exists(db_path):
+        return f'No run history found at {db_path}.'
+
+    connection = sqlite3.connect(db_path)
+    try:
+        job_filter = 'where job = ?' if jobName else ''
+        params = (jobName,) if jobName else ()
+        runs = connection.execute(
+            f'select run_id, started_at, duration_s, status, rows_fixed from runs {job_filter} order by run_id desc limit ?',
+            (*params, window)).fetchall()[::-1]
+        if not runs:
+            return 'No runs recorded.'
+        run_ids = [r[0] for r in runs]
+        marks = ','.join('?' * len(run_ids))
+
+        def collect(sql: str, zero_fill: bool) -> Dict[str, List[float]]:
+            # Volumes are zero-filled (no rows is a real 0); stages only cover runs that recorded them
+            found: Dict[str, Dict[int, float]] = {}
+            for run_id, key, val in connection.execute(sql, run_ids):
+                per_run = found.setdefault(key, {})
+                per_run[run_id] = per_run.get(run_id, 0.0) + val
+            if zero_fill:
+                return {k: [v.get(rid, 0.0) for rid in run_ids] for k, v in sorted(found.items())}
+            return {k: [v[rid] for rid in run_ids if rid in v] for k, v in sorted(found.items())}
+
+        stages = collect(f'select run_id, stage, seconds from stages where run_id in ({marks})', zero_fill=False)
+        stages['(total)'] = [float(r[2] or 0) for r in runs]
+        volumes = collect(f"select run_id, dimension || ': ' || key, rows from counts where run_id in ({marks})", zero_fill=True)
+        fixed = {'ROWS_FIXED': [float(r[4] or 0) for r in runs]}
+
+        send_rows = connection.execute(
+            f'select kind, seconds, ok from sends where run_id in ({marks}) order by run_id', run_ids).fetchall()
+    finally:
+        connection.close()
+
+    headers = ['series', 'runs', 'last', 'median', 'p95', f'last{recent} med', 'flag']
+    out = [
+        f'Runs {runs[0][1]} .. {runs[-1][1]} ({len(runs)} runs; '
+        f'{sum(1 for r in runs if r[3] != "ok")} not ok; last status: {runs[-1][3]})',
+        '',
+        'Stage timings (seconds)',
+        _format_table(headers, _series_rows(stages, recent, tolerance)),
+        '',
+        'Issue volume (rows per run)',
+        _format_table(headers, _series_rows({**fixed, **volumes}, recent, tolerance)),
+        '',
+        'Graph sends (seconds per send)',
+    ]
+
+    send_summary = []
+    for kind in sorted({k for k, _, _ in send_rows}):
+        lat = [s for k, s, _ in send_rows if k == kind]
+        failed = sum(1 for k, _, ok in send_rows if k == kind and not ok)
+        send_summary.append([kind, str(len(lat)), f'{statistics.median(lat):.2f}', f'{_p95(lat):.2f}', str(failed)])
+    out.append(_format_table(['kind', 'sends', 'median', 'p95', 'failed'], send_summary))
+
+    return '\n'.join(out)
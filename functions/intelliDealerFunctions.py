@@ -3,6 +3,10 @@ import codecs
 import logging
 import pandas as pd
 import os
+import math
+import time
+import threading
+from contextlib import contextmanager
 from typing import Dict, Optional
 
 # ------------------------------------------------------------
@@ -29,18 +33,80 @@ def read_id_config():
     return env_conf
 
 
+# ------------------------------------------------------------
+# Deadline helpers — query timeout and statement cancellation
+# ------------------------------------------------------------
+def _stage_end(timeout: Optional[float]) -> Optional[float]:
+    # Absolute monotonic deadline for a call given `timeout` seconds (None = no limit)
+    return None if timeout is None else time.monotonic() + max(0.0, timeout)
+
+def _apply_query_timeout(connection, stage_end: Optional[float]) -> None:
+    """
+    Set the ODBC query timeout (SQL_ATTR_QUERY_TIMEOUT) for cursors created
+    after this call to the seconds left before `stage_end`.
+    """
+    if stage_end is None:
+        return
+    connection.timeout = max(1, int(math.ceil(stage_end - time.monotonic())))
+
+def _login_timeout(stage_end: Optional[float]) -> Dict[str, int]:
+    """
+    `pyodbc.connect` keyword for the ODBC login timeout (seconds left before
+    `stage_end`); empty when there is no deadline.
+    """
+    if stage_end is None:
+        return {}
+    return {'timeout': max(1, int(math.ceil(stage_end - time.monotonic())))}
+
+@contextmanager
+def _deadline_watchdog(cursor, stage_end: Optional[float]):
+    """
+    Cancel the cursor's statement via `cursor.cancel()` if the wrapped block
+    (execute and any fetches) is still running at `stage_end`.
+
+    The IBM i query timeout is checked against the optimizer's estimate and
+    does not end lock waits (which for a SELECT usually happen during fetch),
+    so a watchdog thread enforces the actual deadline.
+    Raises TimeoutError if the deadline has passed or the statement was cancelled.
+    """
+    if stage_end is None:
+        yield
+        return
+
+    left = stage_end - time.monotonic()
+    if left <= 0:
+        raise TimeoutError('stage deadline reached before statement started')
+
+    watchdog = threading.Timer(left, cursor.cancel)
+    watchdog.daemon = True
+    watchdog.start()
+    try:
+        yield
+    except pyodbc.Error as e:
+        if time.monotonic() >= stage_end:
+            raise TimeoutError(f'statement cancelled at stage deadline ({e})') from e
+        raise
+    finally:
+        watchdog.cancel()
+
+
 # ------------------------------------------------------------
 # Data Retreival function — Populate Dataframes
 # ------------------------------------------------------------
 
-def retrieve_id_data(sqlDirectory: str, sqlFileName: str, id_conf: Dict[str, str], logMinutesStart: Optional[str] = None, logMinutesEnd: Optional[str] = None, logInterval: Optional[str] = None) -> pd.DataFrame:
+def retrieve_id_data(sqlDirectory: str, sqlFileName: str, id_conf: Dict[str, str], logMinutesStart: Optional[str] = None, logMinutesEnd: Optional[str] = None, logInterval: Optional[str] = None, timeout: Optional[float] = None) -> pd.DataFrame:
     """
     Retrieve data using an SQL script and IntelliDealer connection info from id_conf.
     id_conf must include: server, database, user, password.
+
+    If `timeout` (seconds) is given, the query is bounded by it (ODBC query
+    timeout plus cancellation); on timeout or error, None is returned.
     """
     logging.info('Executing: retrieve_id_data')
 
+    stage_end = _stage_end(timeout)
     connection = None
+    cursor = None
     try:
         logging.info(' - Connecting to Database')
         connection = pyodbc.connect(
@@ -48,7 +114,8 @@ def retrieve_id_data(sqlDirectory: str, sqlFileName: str, id_conf: Dict[str, str
             system=str(id_conf['server']),
             DBQ=str(id_conf['database']),
             uid=str(id_conf['user']),
-            pwd=str(id_conf['password'])
+            pwd=str(id_conf['password']),
+            **_login_timeout(stage_end)
         )
         logging.info(' - Connected')
 
@@ -59,11 +126,28 @@ def retrieve_id_data(sqlDirectory: str, sqlFileName: str, id_conf: Dict[str, str
 
         getReceivingdata = sql_query_template.format(logMinutesStart=logMinutesStart,logMinutesEnd=logMinutesEnd,logInterval=logInterval)
         logging.info(' - Executing SQL Script and Loading into DataFrame')
-        df = pd.read_sql(sql=getReceivingdata, con=connection)
+        _apply_query_timeout(connection, stage_end)
+        cursor = connection.cursor()
+        records = []
+        with _deadline_watchdog(cursor, stage_end):
+            cursor.execute(getReceivingdata)
+            columns = [d[0] for d in cursor.description]
+            # Fetch in batches so the deadline is also checked between batches
+            while True:
+                batch = cursor.fetchmany(5000)
+                if not batch:
+                    break
+                records.extend(batch)
+                if stage_end is not None and time.monotonic() >= stage_end:
+                    raise TimeoutError('stage deadline reached while fetching')
+        # coerce_float matches pd.read_sql (DECIMAL -> float before convert_dtypes)
+        df = pd.DataFrame.from_records(records, columns=columns, coerce_float=True)
         df = df.convert_dtypes()
         logging.info(' - Data Loaded into DataFrame')
         return df
 
+    except TimeoutError as e:
+        logging.error(f' - Deadline exceeded: {e}')
     except pyodbc.ProgrammingError as e:
         logging.error(f' - Programming Error occurred: {e}')
     except pyodbc.Error as e:
@@ -71,6 +155,8 @@ def retrieve_id_data(sqlDirectory: str, sqlFileName: str, id_conf: Dict[str, str
     except Exception as e:
         logging.error(f' - An unexpected error occurred: {e}')
     finally:
+        if cursor is not None:
+            cursor.close()
         if connection:
             connection.close()
         logging.info(' - Cursor and Connection Closed')
@@ -92,20 +178,54 @@ def first_comment_line(stmt: str) -> str:
         return line[2:].split('*/', 1)[0].lstrip('*').strip()  # first part of a block comment
     return line.strip()                      # fallback (in case a comment isn't present)
 
-def id_sqlScript(sqlDirectory: str, sqlFileName: str, id_conf: Dict[str, str]):
+def statement_verb(stmt: str) -> str:
+    """
+    Return the leading SQL keyword of `stmt` (e.g. 'UPDATE'), skipping comments.
+    """
+    body = stmt.replace('\r\n', '\n').replace('\r', '\n')
+    while True:
+        body = body.lstrip()
+        if body.startswith('--'):
+            body = body.split('\n', 1)[1] if '\n' in body else ''
+        elif body.startswith('/*'):
+            body = body.split('*/', 1)[1] if '*/' in body else ''
+        else:
+            break
+    return body.split(None, 1)[0].upper() if body else ''
+
+def id_sqlScript(sqlDirectory: str, sqlFileName: str, id_conf: Dict[str, str], sqlParams: Optional[Dict[str, str]] = None, timeout: Optional[float] = None):
     """
     Execute an IBM i (iSeries) SQL script via ODBC, statement by statement.
 
-    Opens `{sqlDirectory}/{sqlFileName}.sql` (UTF-8-SIG), splits on semicolons,
+    Opens `{sqlDirectory}/{sqlFileName}.sql` (UTF-8-SIG), fills any `{placeholders}`
+    from `sqlParams` (e.g. the audit rule fragments), splits on semicolons,
     and runs each statement using the iSeries Access ODBC driver. Logs the
     connection steps, a title for each statement (from its first comment, if any),
     and the rows affected. Uses `cmt=0` (autocommit), so each statement is
     committed immediately.
+
+    If `timeout` (seconds) is given, the whole script is bounded by it: the
+    ODBC query timeout is set to the time left and a statement still running
+    at the deadline is cancelled; remaining statements are not run.
+
+    Returns:
+        (results, failed):
+            results: List of (title, verb, rows affected) per completed
+                     statement, where verb is the leading SQL keyword (see
+                     `statement_verb`).
+            failed:  None if every statement ran; otherwise the 1-based index
+                     of the statement that failed or timed out (0 if the
+                     failure came before the first statement). Errors are
+                     logged, not raised.
     """
     logging.info(f'Executing: execute_update_statement function')
 
     # Initializing Connection
     connection = None
+    cursor = None
+    results = []
+    current = 0
+    stage_end = _stage_end(timeout)
 
     try:
         # Connect to the database
@@ -116,7 +236,8 @@ def id_sqlScript(sqlDirectory: str, sqlFileName: str, id_conf: Dict[str, str]):
             DBQ=str(id_conf['database']),
             uid=str(id_conf['user']),
             pwd=str(id_conf['password']),
-            cmt=0)  # Important for transaction management
+            cmt=0,  # Important for transaction management
+            **_login_timeout(stage_end))
         logging.info(' - Connected')
 
         # Access and read SQL script with 'utf-8-sig' encoding
@@ -125,29 +246,39 @@ def id_sqlScript(sqlDirectory: str, sqlFileName: str, id_conf: Dict[str, str]):
         with codecs.open(sql_file_path, 'r', encoding='utf-8-sig') as file:
             script = file.read()
 
+        if sqlParams:
+            script = script.format(**sqlParams)
+
         # Create statement list
         statements = _split_sql_on_semicolons(script)
         logging.info(f' - Found {len(statements)} statement(s)')
 
         # Initialize cursor
         logging.info(f' - Initializing cursor')
+        _apply_query_timeout(connection, stage_end)
         cursor = connection.cursor()
 
         # Looping through Statements
         for i, stmt in enumerate(statements, 1):
+            current = i
             try:
                 # Pull comment as title, log statement being run, run statement, log effected row count
                 title = first_comment_line(stmt) or " ".join(stmt.split())[:120]
                 logging.info(f'   -> Executing [{i}/{len(statements)}]: {title}')
-                cursor.execute(stmt)
+                with _deadline_watchdog(cursor, stage_end):
+                    cursor.execute(stmt)
                 rows = cursor.rowcount
+                results.append((title, statement_verb(stmt), rows))
                 logging.info(f'           -> {rows} effected by statement')
             except Exception as e:
                 logging.error(f'   !! Failed on statement {i}: {stmt[:200]}...')
                 raise
 
         logging.info(f' - {sqlFileName} executed (CMT=0: statements are permanent)')
+        return results, None
 
+    except TimeoutError as e:
+        logging.error(f' - Deadline exceeded: {e}')
     except pyodbc.ProgrammingError as e:
         logging.error(f' - Programming Error occurred: {e}')
     except pyodbc.Error as e:
@@ -160,3 +291,5 @@ def id_sqlScript(sqlDirectory: str, sqlFileName: str, id_conf: Dict[str, str]):
         if connection:
             connection.close()
         logging.info(' - Cursor and Connection Closed')
+
+    return results, current
@@ -39,6 +39,9 @@ def load_htmlTable_settings(settings_path: str | Path | None = None):
         status_colors: Mapping of normalized status -> color (e.g., hex).
         status_order: List of normalized statuses in priority order.
         cc: List of CC email addresses for emails
+        reviewers: List of reviewer email addresses (Invoiced oversight).
+        digest: True to send per-user emails without CC and one consolidated
+                digest per CC/reviewer recipient instead (default False).
 
     Notes:
         Status keys and order are normalized via `_norm_status` for
@@ -54,8 +57,10 @@ def load_htmlTable_settings(settings_path: str | Path | None = None):
     wanted_columns = cfg.get("wanted_columns", [])
     status_order   = [_norm_status(s) for s in cfg.get("status_order", [])]
     status_colors  = {_norm_status(k): v for k, v in cfg.get("status_colors", {}).items()}
+    reviewers      = cfg.get("reviewers", [])
+    digest         = bool(cfg.get("digest", False))
 
-    return wanted_columns, status_colors, status_order, cc
+    return wanted_columns, status_colors, status_order, cc, reviewers, digest
 
 
 # ------------------------------------------------------------
@@ -93,19 +98,9 @@ def sort_for_email(_STATUS_RANK, df: pd.DataFrame) -> pd.DataFrame:
     work = work.sort_values(by=['_rank','INVOICE'], ascending=[False, False], kind='mergesort')
     return work.drop(columns=['_rank'])
 
-def render_html_table(_STATUS_RANK, STATUS_COLORS, df: pd.DataFrame, title: str, subtitle: str = '') -> str:
+def _build_table_html(STATUS_COLORS, df: pd.DataFrame) -> str:
     """
-    Render a status-colored HTML table suitable for email.
-
-    Behavior:
-    - Sorts `df` via `sort_for_email` using `_STATUS_RANK` (status priority, then
-    EVENT_TS desc, then STOCK_NUMBER asc).
-    - Applies row background colors from `STATUS_COLORS` keyed by normalized 'STATUS'.
-    - Wraps the table in minimal inline CSS with title, optional subtitle, and a
-    generated timestamp.
-
-    Returns:
-        str: Complete HTML document as a string.
+    Build a single status-colored `<table>` for `df` (rows in current order).
     """
 
     # Build HTML table with inline row background colors for maximum email-client compatibility
@@ -131,12 +126,54 @@ def render_html_table(_STATUS_RANK, STATUS_COLORS, df: pd.DataFrame, title: str,
     thead = '<thead><tr>' + ''.join(th(col) for col in headers) + '</tr></thead>'
     tbody = '<tbody>' + ''.join(rows_html) + '</tbody>'
 
+    return f"<table>{thead}{tbody}</table>"
+
+def render_html_table(_STATUS_RANK, STATUS_COLORS, df: pd.DataFrame, title: str, subtitle: str = '', group_col: Optional[str] = None, group_labels: Optional[dict] = None, group_counts: bool = True) -> str:
+    """
+    Render a status-colored HTML table suitable for email.
+
+    Behavior:
+    - Sorts `df` via `sort_for_email` using `_STATUS_RANK` (status priority, then
+    INVOICE desc).
+    - Applies row background colors from `STATUS_COLORS` keyed by normalized 'STATUS'.
+    - If `group_col` (e.g. 'RULE_ID') is present, renders one table per group
+    under a heading from `group_labels` (ordered as `group_labels`, then any
+    unlabeled groups alphabetically; blank/NA values go last as 'Unassigned').
+    The group's row count is appended unless `group_counts` is False (labels
+    that already carry counts).
+    - Wraps the table(s) in minimal inline CSS with title, optional subtitle, and a
+    generated timestamp.
+
+    Returns:
+        str: Complete HTML document as a string.
+    """
+
+    df = sort_for_email(_STATUS_RANK, df)
+
+    if group_col and group_col in df.columns:
+        labels = group_labels or {}
+        keys = df[group_col].astype(object).where(df[group_col].notna(), '').astype(str).str.strip()
+        keys = keys.where(keys.ne(''), 'Unassigned')
+        present = list(keys.unique())
+        ordered = [g for g in labels if g in present] + sorted(g for g in present if g not in labels and g != 'Unassigned')
+        if 'Unassigned' in present and 'Unassigned' not in ordered:
+            ordered.append('Unassigned')
+        sections = []
+        for g in ordered:
+            df_group = df.loc[keys.eq(g)]
+            heading = f"{labels.get(g, g)} ({len(df_group)})" if group_counts else labels.get(g, g)
+            sections.append(f"<h3>{_html.escape(heading)}</h3>{_build_table_html(STATUS_COLORS, df_group)}")
+        table_html = ''.join(sections)
+    else:
+        table_html = _build_table_html(STATUS_COLORS, df)
+
     style = """
     <style>
       body { font-family: -apple-system,BlinkMacSystemFont,Segoe UI,Roboto,Helvetica,Arial,sans-serif; }
       .container { max-width: 1080px; margin: 0 auto; padding: 12px 16px; }
       h1 { font-size: 18px; margin: 0 0 4px; }
       h2 { font-size: 14px; font-weight: normal; color: #555; margin: 0 0 12px; }
+      h3 { font-size: 14px; margin: 16px 0 6px; }
       table { border-collapse: collapse; width: 100%; font-size: 13px; }
       th, td { border: 1px solid #ddd; padding: 6px 8px; text-align: left; }
       th { background: #f4f6f8; }
@@ -144,9 +181,6 @@ def render_html_table(_STATUS_RANK, STATUS_COLORS, df: pd.DataFrame, title: str,
     </style>
     """
 
-
-    table_html = f"<table>{thead}{tbody}</table>"
-
     html = f"""
     <html>
       <head>{style}</head>
@@ -161,4 +195,4 @@ def render_html_table(_STATUS_RANK, STATUS_COLORS, df: pd.DataFrame, title: str,
     </html>
     """
 
-    return html
\ No newline at end of file
+    return html
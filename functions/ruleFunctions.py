@@ -0,0 +1,261 @@
+import re
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List
+
+# ------------------------------------------------------------
+# Audit Rule Registry Loading
+# ------------------------------------------------------------
+_RULE_ID_PATTERN = re.compile(r'^[A-Z][A-Z0-9_]{0,19}$')
+_IDENTIFIER_PATTERN = re.compile(r'^[A-Za-z][A-Za-z0-9_]{0,29}$')
+_EXPRESSION_KEYS = ('detect', 'current', 'correct', 'sold_type')
+
+def load_audit_rules(rules_path: str | Path | None = None) -> List[Dict]:
+    """
+    Load the audit rule registry from JSON.
+
+    If `rules_path` is None, defaults to
+    <repo_root>/config/auditRules.json (relative to this file).
+
+    Each rule declares:
+        rule_id:     Upper-case identifier (stored in DMOVRACCF.Rule_Id).
+        description: Human readable label used in email reports.
+        line_types:  List of CGIIND VDTYP values the rule applies to.
+        mapping:     Optional lookup (name, columns, join, values) left joined
+                     on `join` = first mapping column.
+        detect:      Extra SQL predicate a line must satisfy to be checked.
+        current:     SQL expression for the value currently on the line.
+        correct:     SQL expression for the value the line should carry.
+        sold_type:   Optional SQL expression reported as SOLD_TYPE.
+        update:      CGIIND column -> [start, length] slice of the correct value.
+                     Rules writing any of the same columns must declare the
+                     identical update mapping (they then share one UPDATE).
+                     Rules sharing a mapping name must declare it identically.
+
+    Returns:
+        List of validated rule dicts in registry (priority) order.
+    """
+    if rules_path is None:
+        rules_path = Path(__file__).resolve().parents[1] / "config" / "auditRules.json"
+
+    with open(rules_path, "r", encoding="utf-8") as f:
+        cfg = json.load(f)
+
+    rules = cfg.get("rules", [])
+    if not rules:
+        raise ValueError(f"No audit rules defined in {rules_path}.")
+
+    seen = set()
+    for rule in rules:
+        _validate_rule(rule)
+        if rule['rule_id'] in seen:
+            raise ValueError(f"Duplicate audit rule_id: {rule['rule_id']}")
+        seen.add(rule['rule_id'])
+
+    _validate_shared_targets(rules)
+
+    logging.info(f"Audit rules loaded: {', '.join(r['rule_id'] for r in rules)}")
+    return rules
+
+def _validate_rule(rule: Dict) -> None:
+    """
+    Fail clearly on registry entries that would generate invalid SQL.
+    """
+    rule_id = str(rule.get('rule_id') or '')
+    if not _RULE_ID_PATTERN.match(rule_id):
+        raise ValueError(f"Invalid audit rule_id '{rule_id}' (expected A-Z, 0-9, '_'; max 20 chars).")
+
+    for key in ('line_types', 'current', 'correct', 'update'):
+        if not rule.get(key):
+            raise ValueError(f"Audit rule {rule_id} is missing '{key}'.")
+
+    # Statements are split on ';' before execution (quoted literals included), so no rule text may contain one
+    for key in (*_EXPRESSION_KEYS, 'description'):
+        if ';' in str(rule.get(key) or ''):
+            raise ValueError(f"Audit rule {rule_id} '{key}' may not contain ';'.")
+
+    line_types = rule['line_types']
+    if not isinstance(line_types, list) or not all(isinstance(t, str) and t for t in line_types):
+        raise ValueError(f"Audit rule {rule_id} 'line_types' must be a list of VDTYP strings.")
+    if any(';' in t for t in line_types):
+        raise ValueError(f"Audit rule {rule_id} 'line_types' may not contain ';'.")
+
+    update = rule['update']
+    if not isinstance(update, dict):
+        raise ValueError(f"Audit rule {rule_id} 'update' must map CGIIND columns to [start, length].")
+    for col, target in update.items():
+        if not _IDENTIFIER_PATTERN.match(str(col)):
+            raise ValueError(f"Audit rule {rule_id} has invalid update column '{col}'.")
+        if (not isinstance(target, (list, tuple)) or len(target) != 2
+                or not all(isinstance(v, int) and not isinstance(v, bool) and v > 0 for v in target)):
+            raise ValueError(f"Audit rule {rule_id} update '{col}' must be [start, length] (positive integers).")
+
+    mapping = rule.get('mapping')
+    if mapping:
+        if not mapping.get('name') or not mapping.get('columns') or not mapping.get('join'):
+            raise ValueError(f"Audit rule {rule_id} mapping requires name, columns and join.")
+        for ident in [mapping['name'], *mapping['columns']]:
+            if not _IDENTIFIER_PATTERN.match(str(ident)):
+                raise ValueError(f"Audit rule {rule_id} mapping has invalid identifier '{ident}'.")
+        if ';' in str(mapping['join']):
+            raise ValueError(f"Audit rule {rule_id} mapping 'join' may not contain ';'.")
+        if any(len(row) != len(mapping['columns']) for row in mapping.get('values', [])):
+            raise ValueError(f"Audit rule {rule_id} mapping values must have {len(mapping['columns'])} column(s).")
+        if any(';' in str(v) for row in mapping.get('values', []) for v in row):
+            raise ValueError(f"Audit rule {rule_id} mapping 'values' may not contain ';'.")
+
+def _validate_shared_targets(rules: List[Dict]) -> None:
+    """
+    Fail on rules that would generate conflicting SQL across the registry:
+    overlapping but unequal update targets, or one mapping name defined twice
+    with different contents.
+    """
+    for i, rule in enumerate(rules):
+        for other in rules[i + 1:]:
+            shared = set(rule['update']) & set(other['update'])
+            if shared and _update_key(rule) != _update_key(other):
+                raise ValueError(
+                    f"Audit rules {rule['rule_id']} and {other['rule_id']} both write {', '.join(sorted(shared))} "
+                    f"but declare different update targets; they must be identical.")
+
+    mappings: Dict[str, Dict] = {}
+    for rule in rules:
+        mapping = rule.get('mapping')
+        if not mapping:
+            continue
+        prev = mappings.setdefault(mapping['name'].upper(), mapping)
+        if _mapping_key(prev) != _mapping_key(mapping):
+            raise ValueError(f"Audit mapping {mapping['name']} is defined differently by more than one rule.")
+
+def _update_key(rule: Dict) -> tuple:
+    # Full update target (columns and slices), order-insensitive
+    return tuple(sorted((col.upper(), tuple(target)) for col, target in rule['update'].items()))
+
+def _mapping_key(mapping: Dict) -> tuple:
+    # Comparable mapping definition (name, columns, join, values)
+    return (mapping['name'].upper(), tuple(c.upper() for c in mapping['columns']),
+            ' '.join(str(mapping['join']).split()), tuple(tuple(str(v) for v in row) for row in mapping.get('values', [])))
+
+
+# ------------------------------------------------------------
+# Fix Script Builder — one candidate scan for all rules
+# ------------------------------------------------------------
+def _sql_literal(val: object) -> str:
+    """
+    Quote a value as a DB2 string literal.
+    """
+    return "'" + str(val).replace("'", "''") + "'"
+
+def _case_branches(rules: List[Dict], column_prefix: str) -> str:
+    """
+    Build the `when '<rule>' then <prefix>_<rule>` branches that pick a rule's
+    candidate column after the cross join with Rules.
+    """
+    return ' '.join(f"when {_sql_literal(r['rule_id'])} then {column_prefix}_{r['rule_id']}" for r in rules)
+
+def _build_updates(rules: List[Dict]) -> str:
+    """
+    Build one CGIIND UPDATE per distinct update target.
+
+    Rules with the same update target (columns and slices, enforced by
+    `_validate_shared_targets`) share a statement; if several of them flag the
+    same line, the earliest rule in the registry wins.
+    """
+    key = 'a.VDCO||a.VDDIV||a.VDBR||a.VDINV||a.VDLIN||a.VDTYP||a.VDSEQ'
+
+    groups: Dict[tuple, List[Dict]] = {}
+    for rule in rules:
+        groups.setdefault(_update_key(rule), []).append(rule)
+
+    statements = []
+    for group in groups.values():
+        columns = list(group[0]['update'].keys())
+        rule_ids = ','.join(_sql_literal(r['rule_id']) for r in group)
+        order_by = ''
+        if len(group) > 1:
+            priority = ' '.join(f"when {_sql_literal(r['rule_id'])} then {i}" for i, r in enumerate(group, 1))
+            order_by = f"\n        order by case b.Rule_Id {priority} end"
+
+        set_clauses = []
+        for col in columns:
+            start, length = group[0]['update'][col]
+            set_clauses.append(
+                f"   {col} =\n"
+                f"        (select substring(Correct_Acc,{int(start)},{int(length)})\n"
+                f"        from DMOVRACCF as b\n"
+                f"        where {key} = b.Trade_Key and b.Rule_Id in ({rule_ids}){order_by}\n"
+                f"        fetch first 1 row only)"
+            )
+
+        statements.append(
+            f"-- update CGIIND ({', '.join(r['rule_id'] for r in group)})\n"
+            f"update CGIIND as a\n"
+            f"set\n" + ',\n'.join(set_clauses) + "\n"
+            f"where\n"
+            f"   {key} in\n"
+            f"        (select Trade_Key from DMOVRACCF where STATUS <> 'Invoiced' and Rule_Id in ({rule_ids}))"
+        )
+
+    return ';\n\n'.join(statements)
+
+def build_fix_params(rules: List[Dict]) -> Dict[str, str]:
+    """
+    Build the placeholder values for `sql/fixScript.sql` from the rule registry.
+
+    Every rule becomes a set of columns on a single CGIIND/CGIINH/CGIBASE
+    candidate scan (hit flag, current, correct, sold type). The scan is then
+    cross joined with the Rules list and filtered to the rules each line
+    violates, so N rules cost one table pass instead of N.
+
+    Returns:
+        Dict of placeholder name -> SQL fragment for `str.format`.
+    """
+    mappings = []
+    joins = []
+    columns = []
+    seen_mappings = set()
+    for rule in rules:
+        rid = rule['rule_id']
+        mapping = rule.get('mapping')
+        # Shared lookups (identical by validation) become one CTE and one join
+        if mapping and mapping['name'].upper() not in seen_mappings:
+            seen_mappings.add(mapping['name'].upper())
+            rows = ',\n'.join(
+                '    (' + ','.join(_sql_literal(v) for v in row) + ')' for row in mapping.get('values', [])
+            )
+            mappings.append(f"{mapping['name']}({', '.join(mapping['columns'])}) AS (\n  VALUES\n{rows}\n    ),\n")
+            joins.append(f"        left join {mapping['name']} on ({mapping['join']}) = {mapping['name']}.{mapping['columns'][0]}")
+
+        line_types = ','.join(_sql_literal(t) for t in rule['line_types'])
+        detect = rule.get('detect') or '1 = 1'
+        sold_type = rule.get('sold_type') or "cast(NULL as varchar(20))"
+        # Parenthesize every fragment so an OR inside one cannot escape the rule's VDTYP filter
+        columns.append(
+            f"        case when a.VDTYP in ({line_types}) and ({detect}) and ({rule['current']}) <> ({rule['correct']})"
+            f" then 1 else 0 end As Hit_{rid},\n"
+            f"        ({rule['current']}) As Cur_{rid},\n"
+            f"        ({rule['correct']}) As Cor_{rid},\n"
+            f"        ({sold_type}) As Typ_{rid}"
+        )
+
+    all_line_types = sorted({t for r in rules for t in r['line_types']})
+
+    return {
+        'ruleMappings': ''.join(mappings),
+        'ruleValues':   ',\n'.join(f"    ({_sql_literal(r['rule_id'])})" for r in rules),
+        'ruleColumns':  ',\n'.join(columns),
+        'ruleJoins':    '\n'.join(joins),
+        'lineTypes':    ','.join(_sql_literal(t) for t in all_line_types),
+        'ruleSoldType': _case_branches(rules, 'Typ'),
+        'ruleCurrent':  _case_branches(rules, 'Cur'),
+        'ruleCorrect':  _case_branches(rules, 'Cor'),
+        'ruleHit':      _case_branches(rules, 'Hit'),
+        'ruleUpdates':  _build_updates(rules),
+    }
+
+def rule_labels(rules: List[Dict]) -> Dict[str, str]:
+    """
+    Map rule_id -> description for report headings (falls back to rule_id).
+    """
+    return {r['rule_id']: str(r.get('description') or r['rule_id']) for r in rules}
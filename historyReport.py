@@ -0,0 +1,26 @@
+import argparse
+from functions.historyFunctions import history_report, HISTORY_DB
+
+# ------------------------------------------------------------
+# Run History Report (CLI)
+# ------------------------------------------------------------
+def main():
+    """
+    Print rolling medians, p95s and drift flags from the run history DB.
+
+    Usage:
+        python historyReport.py [--window 30] [--recent 5] [--tolerance 0.25]
+    """
+    parser = argparse.ArgumentParser(description='Over Allowance Fix run history report')
+    parser.add_argument('--db', default=HISTORY_DB, help='Path to the run history SQLite DB')
+    parser.add_argument('--job', default='OverAllowAccFix', help='Job name to report on')
+    parser.add_argument('--window', type=int, default=30, help='Number of most recent runs to include')
+    parser.add_argument('--recent', type=int, default=5, help='Runs compared against the earlier baseline for drift')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Drift threshold as a fraction above the baseline median')
+    args = parser.parse_args()
+
+    print(history_report(args.db, window=args.window, recent=args.recent, tolerance=args.tolerance, jobName=args.job))
+
+
+if __name__ == '__main__':
+    main()
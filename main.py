@@ -1,10 +1,14 @@
+import time
 import logging
 import datetime
 from functions.intelliDealerFunctions import id_sqlScript, retrieve_id_data, read_id_config
-from functions.graphFunctions import send_email_graph, read_graph_config
-from functions.evaluationFunctions import build_dfUsers_from_df, compile_error_list
+from functions.graphFunctions import send_email_graph, read_graph_config, get_graph_token
+from functions.evaluationFunctions import build_dfUsers_from_df, compile_error_list, count_by_rule, compile_digest, digest_user_labels
 from functions.renderingFunctions import load_htmlTable_settings, sort_for_email, render_html_table
 from functions.maintenanceFunctions import remove_old_files
+from functions.ruleFunctions import load_audit_rules, build_fix_params, rule_labels
+from functions.historyFunctions import start_run_record, mark_stage, record_send, record_counts, record_statement_counts, save_run_record
+from functions.deadlineFunctions import start_deadline, stage_deadline, remaining, expired
 
 # ------------------------------------------------------------
 # Job and Logging Configuration
@@ -12,6 +16,11 @@ from functions.maintenanceFunctions import remove_old_files
 jobName = 'OverAllowAccFix'
 sqlDirectory = 'sql'
 
+# Run deadline (inside the 30 minute Task Scheduler stop) and per-stage budgets, in seconds
+runBudgetSeconds = 25 * 60
+stageBudgets = {'fix': 15 * 60, 'retrieve': 3 * 60, 'send': 5 * 60}
+sendTimeoutSeconds = 30
+
 # Initialize Log file
 log_filename = datetime.datetime.now().strftime(f'logs/{jobName}_%Y-%m-%d_%H-%M-%S.log')
 logging.basicConfig(level=logging.INFO,
@@ -21,6 +30,50 @@ logging.basicConfig(level=logging.INFO,
 
 logging.info(f'{jobName} Job and Logging Config loaded')
 
+# Initialize Run History record (saved to history/runHistory.db on exit)
+RUN_RECORD = start_run_record(jobName)
+
+
+# ------------------------------------------------------------
+# Helper functions — Report text
+# ------------------------------------------------------------
+def _rule_summary(df, RULE_LABELS) -> str:
+    """
+    Return ' • <rule>: <count>' segments for subtitles ('' if only one rule is present).
+    """
+    counts = count_by_rule(df, list(RULE_LABELS))
+    if len(counts) < 2:
+        return ''
+    return ''.join(f" • {rule}: {n}" for rule, n in counts.items())
+
+def _fixed_text(count: int, fix_applied: bool) -> str:
+    """
+    Subject fragment for Pending/Released rows; never claims auto-fixes the run did not confirm.
+    """
+    return f"{count} auto-fixed" if fix_applied else f"{count} Pending/Released not confirmed fixed"
+
+def _fixed_label(fix_applied: bool) -> str:
+    # Subtitle label for the Pending/Released count
+    return "Auto-fixed (Pending+Released)" if fix_applied else "Not confirmed fixed (Pending+Released)"
+
+def _fix_title(fix_applied: bool) -> str:
+    # Email title; degraded runs do not state that Pending/Released were fixed
+    return "Pending and Released fixed / Invoiced requires journal" if fix_applied else "Pending and Released fix not confirmed / Invoiced requires journal"
+
+def _timed_send(kind: str, to_addr: str, subject: str, html_body: str, graph_conf, send_deadline, cc=None, token=None) -> None:
+    """
+    Send via `send_email_graph` within the remaining send budget (token and
+    sendMail requests together) and record the latency/outcome in RUN_RECORD
+    (re-raises on failure).
+    """
+    t0 = time.perf_counter()
+    try:
+        send_email_graph(to_addr, subject, html_body, graph_conf, cc, timeout=max(1.0, remaining(send_deadline, cap=sendTimeoutSeconds)), token=token)
+    except Exception:
+        record_send(RUN_RECORD, kind, to_addr, time.perf_counter() - t0, ok=False)
+        raise
+    record_send(RUN_RECORD, kind, to_addr, time.perf_counter() - t0, ok=True)
+
 
 # ------------------------------------------------------------
 # Main Orchestrator
@@ -32,15 +85,32 @@ def main():
     Workflow:
         1) Load IntelliDealer (DB2) and Microsoft Graph configs.
         2) Load HTML table preferences and compute a status-priority map.
-        3) Execute `sql/fixScript.sql` to rebuild the working table and update
-           Pending/Released items in IntelliDealer (Invoiced excluded).
+        3) Load the audit rule registry (`config/auditRules.json`) and execute
+           `sql/fixScript.sql` to rebuild the working table in one candidate scan
+           tagged by rule, then update Pending/Released items in IntelliDealer
+           (Invoiced excluded).
         4) Retrieve the ErrorLog dataset and derive:
            - per-user error lists (for settlement users)
            - the Invoiced subset (last 30 days) for reviewer oversight.
-        5) For each user with data: sort by status priority, render an HTML table,
-           and email via Graph (with configured CC).
-        6) If Invoiced issues exist, email a summary to the designated reviewer.
+        5) For each user with data: sort by status priority, render HTML tables
+           grouped by rule, and email via Graph (with configured CC unless
+           digest mode is on).
+        6) Digest mode: render one consolidated digest (grouped by user and
+           status) and send it once to each CC/reviewer recipient.
+           Otherwise, if Invoiced issues exist, email a summary to the reviewers.
         7) Rotate logs, keeping the newest 10 files.
+        8) Append stage timings, issue counts and send latencies to the run
+           history DB (see `historyReport.py`).
+
+    Deadlines:
+        The run is bounded by `runBudgetSeconds`, split into `stageBudgets`.
+        DB2 statements get an ODBC query timeout and are cancelled at their
+        stage deadline. Graph sends share one send budget: the access token
+        is fetched once, and each send's requests together stay within
+        `sendTimeoutSeconds` and the budget left. If the scan fails
+        or overruns, DMOVRACCF still points at the last good results; if the
+        scan was published but the CGIIND updates did not finish, the new
+        results are reported without claiming auto-fixes. Both are DEGRADED.
 
     Notes:
         Designed for unattended runs via Windows Task Scheduler
@@ -50,6 +120,8 @@ def main():
     # ------------------------------------------------------------
     # Load Connection Settings
     # ------------------------------------------------------------
+    mark_stage(RUN_RECORD, 'config')
+    run_deadline = start_deadline(runBudgetSeconds)
     logging.info('Loading Connection Settings...')
 
     # IntelliDealer connection
@@ -67,7 +139,10 @@ def main():
     logging.info('Loading HTML Table Preferences...')
 
     # Load HTML Table Settings
-    WANTED_COLUMNS, STATUS_COLORS, STATUS_ORDER, CC = load_htmlTable_settings()
+    WANTED_COLUMNS, STATUS_COLORS, STATUS_ORDER, CC, REVIEWERS, DIGEST = load_htmlTable_settings()
+
+    # In digest mode CC recipients get one consolidated email instead of a copy of every user email
+    USER_CC = [] if DIGEST else CC
 
     # Precompute rank mapping for fast sort (higher rank = earlier in table)
     # reversed() + start=1 → items at the start of STATUS_ORDER get the highest rank
@@ -76,23 +151,86 @@ def main():
     logging.info(' - Table Preferences loaded')
 
 
+    # ------------------------------------------------------------
+    # Load Audit Rules
+    # ------------------------------------------------------------
+    logging.info('Loading Audit Rules...')
+
+    AUDIT_RULES = load_audit_rules()
+    RULE_LABELS = rule_labels(AUDIT_RULES)
+    fixParams = build_fix_params(AUDIT_RULES)
+
+    logging.info(f' - {len(AUDIT_RULES)} Audit Rule(s) loaded')
+
+
     # ------------------------------------------------------------
     # Find, log and fix Overallowance Account issues
     # ------------------------------------------------------------
+    mark_stage(RUN_RECORD, 'fix')
     logging.info('Processing Fixes...')
 
-    id_sqlScript(sqlDirectory, 'fixScript', id_conf)
-    logging.info(' - Found, logged and fixed over allowance account issue for pending and released invoices')
+    fix_deadline = stage_deadline(run_deadline, stageBudgets['fix'], 'fix')
+
+    # DMOVRACCF is an alias over DMOVRACCA/DMOVRACCB: scan into the one it does not point to
+    workTable = None
+    dfActive = retrieve_id_data(sqlDirectory, 'activeIssuesTable', id_conf, timeout=remaining(fix_deadline))
+    if dfActive is not None and not dfActive.empty:
+        workTable = 'DMOVRACCB' if str(dfActive.iloc[0, 0]).strip().upper() == 'DMOVRACCA' else 'DMOVRACCA'
+
+    # FIX_STATE: 'ok' | 'stale' (scan not published; last good DMOVRACCF) | 'incomplete' (scan published, updates not finished)
+    if workTable is None:
+        FIX_STATE = 'stale'
+        logging.warning(' - Could not resolve the DMOVRACCF alias; fix script not run')
+    else:
+        fixResults, failedAt = id_sqlScript(sqlDirectory, 'fixScript', id_conf, {**fixParams, 'workTable': workTable}, timeout=remaining(fix_deadline))
+        published = any(verb == 'CREATE' for _, verb, _ in fixResults)
+        RUN_RECORD['rows_fixed'] = record_statement_counts(RUN_RECORD, fixResults, 'UPDATE')
+        if failedAt is None:
+            FIX_STATE = 'ok'
+        elif published:
+            FIX_STATE = 'incomplete'
+        else:
+            FIX_STATE = 'stale'
+        if failedAt is not None:
+            logging.warning(f' - Fix script stopped at statement {failedAt}')
+
+    FIX_APPLIED = FIX_STATE == 'ok'
+    if FIX_APPLIED:
+        logging.info(' - Found, logged and fixed account coding issues for pending and released invoices')
+    elif FIX_STATE == 'incomplete':
+        RUN_RECORD['status'] = 'degraded'
+        logging.warning(' - Scan published but CGIIND updates did not finish; reporting without auto-fix claims (DEGRADED)')
+    else:
+        RUN_RECORD['status'] = 'degraded'
+        logging.warning(' - Scan failed or overran; reporting from last good DMOVRACCF contents (DEGRADED)')
+
+    subjectPrefix = '' if FIX_APPLIED else '[DEGRADED] '
+    degradedNote  = {
+        'ok':         '',
+        'incomplete': ' • DEGRADED: issues are current but the CGIIND fix did not finish; Pending/Released rows may not be corrected',
+        'stale':      ' • DEGRADED: scan did not complete this run; showing last good results, no fixes applied this run',
+    }[FIX_STATE]
 
 
     # ------------------------------------------------------------
     # Load and compile working datasets
     # ------------------------------------------------------------
+    mark_stage(RUN_RECORD, 'retrieve')
     logging.info('Retrieving dataframes...')
 
-    dfErrorLog = retrieve_id_data(sqlDirectory, 'errorLog', id_conf)
+    retrieve_deadline = stage_deadline(run_deadline, stageBudgets['retrieve'], 'retrieve')
+    dfErrorLog = retrieve_id_data(sqlDirectory, 'errorLog', id_conf, timeout=remaining(retrieve_deadline))
+    if dfErrorLog is None:
+        raise RuntimeError('ErrorLog dataset could not be retrieved; nothing to report.')
     logging.info(' - ErrorLog dataset loaded')
 
+    record_counts(RUN_RECORD, dfErrorLog, ['STATUS', 'RULE_ID', 'BRANCH', 'SALESPERSON'])
+
+    # Rows fixed this run: non-Invoiced issues, recorded only when the CGIIND updates all ran
+    if FIX_APPLIED:
+        dfFixed = dfErrorLog.loc[dfErrorLog['STATUS'].isin(['Pending', 'Released'])]
+        record_counts(RUN_RECORD, dfFixed, ['STATUS', 'RULE_ID'], prefix='FIXED_')
+
     dfAlertUsers = build_dfUsers_from_df(dfErrorLog)
     logging.info(' - Alert Users Loaded')
 
@@ -103,6 +241,18 @@ def main():
     # ------------------------------------------------------------
     # Process user email notifications
     # ------------------------------------------------------------
+    mark_stage(RUN_RECORD, 'user_emails')
+
+    # One send budget shared by user, digest and reviewer emails
+    send_deadline = stage_deadline(run_deadline, stageBudgets['send'], 'send')
+
+    # One Graph access token for every send; if it fails, each send fetches its own within its timeout
+    graph_token = None
+    try:
+        graph_token = get_graph_token(graph_conf, timeout=max(1.0, remaining(send_deadline, cap=sendTimeoutSeconds)))
+    except Exception as e:
+        logging.exception(f' - Graph token request failed: {e}')
+
     # Initialize Counts
     logging.info('Initializing Counts')
     processed = 0
@@ -112,6 +262,12 @@ def main():
     logging.info('Starting Settlement Auditor Processing Loop')
     for _, user in dfAlertUsers.iterrows():
 
+        # Stop sending once the send budget is spent
+        if expired(send_deadline):
+            RUN_RECORD['status'] = 'degraded'
+            logging.warning(' - Send budget exhausted; remaining user emails skipped')
+            break
+
         # Assign Current User attributes
         email = str(user.get('Email') or '').strip()
         name = str(user.get('Name') or '').strip()
@@ -139,39 +295,87 @@ def main():
         corrected_count = int(df_send["STATUS"].isin(["Pending", "Released"]).sum())
 
         # Setting Email variables
-        subject  = f"Overallowance Account Errors for {name} ({len(df_send)} records; {corrected_count} auto-fixed)"
-        title   = f"Pending and Released fixed / Invoiced requires journal"
-        subtitle = f"Auto-fixed (Pending+Released): {corrected_count} • Total: {len(df_send)}"
+        subject  = f"{subjectPrefix}Overallowance Account Errors for {name} ({len(df_send)} records; {_fixed_text(corrected_count, FIX_APPLIED)})"
+        title   = _fix_title(FIX_APPLIED)
+        subtitle = f"{_fixed_label(FIX_APPLIED)}: {corrected_count} • Total: {len(df_send)}" + _rule_summary(df_send, RULE_LABELS) + degradedNote
 
         # Rendering HTML email
-        body_html = render_html_table(_STATUS_RANK, STATUS_COLORS, df_send, title=title, subtitle=subtitle)
+        body_html = render_html_table(_STATUS_RANK, STATUS_COLORS, df_send, title=title, subtitle=subtitle, group_col='RULE_ID', group_labels=RULE_LABELS)
         
         # Sending email to user
         try:
-            send_email_graph(email, subject, body_html, graph_conf, CC)
+            _timed_send('user', email, subject, body_html, graph_conf, send_deadline, USER_CC, graph_token)
             sent += 1
         except Exception as e:
             logging.exception(f'Failed for {email}: {e}')
             continue
     
-    # Check for Invoiced Issues, if found send to Leanne for Intervention
-    if not dfInvoiced.empty:
-        inv_subject  = f"Overallowance: {len(dfInvoiced)} invoiced issues requiring journal"
+    # ------------------------------------------------------------
+    # Process CC / reviewer notifications
+    # ------------------------------------------------------------
+    mark_stage(RUN_RECORD, 'digest' if DIGEST else 'reviewer_email')
+    if DIGEST:
+        # One digest rendered once, sent once per distinct CC/reviewer address
+        digest_recipients = list(dict.fromkeys(a.strip().lower() for a in CC + REVIEWERS if a and a.strip()))
+        dfDigest = compile_digest(WANTED_COLUMNS, dfErrorLog)
+
+        if not dfDigest.empty and digest_recipients:
+            corrected_total = int(dfDigest["STATUS"].isin(["Pending", "Released"]).sum())
+            dig_subject  = f"{subjectPrefix}Overallowance digest: {len(dfDigest)} records; {_fixed_text(corrected_total, FIX_APPLIED)}; {len(dfInvoiced)} invoiced requiring journal"
+            dig_title    = _fix_title(FIX_APPLIED) + " (all users)"
+            dig_subtitle = f"{_fixed_label(FIX_APPLIED)}: {corrected_total} • Invoiced: {len(dfInvoiced)} • Total: {len(dfDigest)}" + _rule_summary(dfDigest, RULE_LABELS) + degradedNote
+            body_htmlDigest = render_html_table(_STATUS_RANK, STATUS_COLORS, dfDigest, title=dig_title, subtitle=dig_subtitle, group_col='USER', group_labels=digest_user_labels(dfDigest, STATUS_ORDER), group_counts=False)
+
+            for recipient in digest_recipients:
+                if expired(send_deadline):
+                    RUN_RECORD['status'] = 'degraded'
+                    logging.warning(' - Send budget exhausted; remaining digests skipped')
+                    break
+                try:
+                    _timed_send('digest', recipient, dig_subject, body_htmlDigest, graph_conf, send_deadline, token=graph_token)
+                    sent += 1
+                except Exception as e:
+                    logging.exception(f'Digest failed for {recipient}: {e}')
+                    continue
+            logging.info(f' - Digest processed for {len(digest_recipients)} CC/reviewer recipient(s)')
+
+    # Check for Invoiced Issues, if found send to reviewers for Intervention
+    elif not dfInvoiced.empty and REVIEWERS:
+        inv_subject  = f"{subjectPrefix}Overallowance: {len(dfInvoiced)} invoiced issues requiring journal"
         inv_title    = "Invoiced requires journal"
-        inv_subtitle = f"Total Invoiced records: {len(dfInvoiced)}"
-        body_htmlInvoiced = render_html_table(_STATUS_RANK, STATUS_COLORS, dfInvoiced,title=inv_title, subtitle=inv_subtitle)
-        send_email_graph("lsmith@hurontractor.com", inv_subject, body_htmlInvoiced, graph_conf)
-        logging.info(f' - Sent Invoiced Issues to Leanne for intervention')
+        inv_subtitle = f"Total Invoiced records: {len(dfInvoiced)}" + _rule_summary(dfInvoiced, RULE_LABELS) + degradedNote
+        body_htmlInvoiced = render_html_table(_STATUS_RANK, STATUS_COLORS, dfInvoiced, title=inv_title, subtitle=inv_subtitle, group_col='RULE_ID', group_labels=RULE_LABELS)
+        for reviewer in REVIEWERS:
+            if expired(send_deadline):
+                RUN_RECORD['status'] = 'degraded'
+                logging.warning(' - Send budget exhausted; remaining reviewer emails skipped')
+                break
+            try:
+                _timed_send('reviewer', reviewer, inv_subject, body_htmlInvoiced, graph_conf, send_deadline, token=graph_token)
+                sent += 1
+            except Exception as e:
+                logging.exception(f'Reviewer email failed for {reviewer}: {e}')
+                continue
+        logging.info(f' - Sent Invoiced Issues to reviewers for intervention')
 
     # ------------------------------------------------------------
     # Log clean up
     # ------------------------------------------------------------
+    mark_stage(RUN_RECORD, 'cleanup')
+
     # Removing old Log files
     logging.info(f'Removing old logs.')
     remove_old_files('logs', 10)
 
-    logging.info(f'Error Processing complete. Users processed: {processed}; Emails sent: {sent}.')  
+    logging.info(f'Error Processing complete. Users processed: {processed}; Emails sent: {sent}; Run status: {RUN_RECORD["status"]}.')  
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    try:
+        main()
+    except Exception:
+        RUN_RECORD['status'] = 'failed'
+        logging.exception(f'{jobName} failed')
+        raise
+    finally:
+        save_run_record(RUN_RECORD)
\ No newline at end of file
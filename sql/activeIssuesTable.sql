@@ -0,0 +1,3 @@
+select BASE_TABLE_NAME
+from QSYS2.SYSTABLES
+where TABLE_NAME = 'DMOVRACCF' and TABLE_TYPE = 'A' and TABLE_SCHEMA = CURRENT SCHEMA